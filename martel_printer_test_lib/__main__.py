@@ -2,7 +2,6 @@ from time import time
 from pathlib import Path
 import os
 
-from PIL import Image
 import pytesseract
 
 from analyser import AnlayserNotFound
@@ -28,28 +27,28 @@ def main():
     pytesseract.pytesseract.tesseract_cmd = r'C:\Users\ryansullivan\AppData\Local\Tesseract-OCR\tesseract'
 
     try:
-        printer = Printer()
-        printer.startup()
-        printer.init_comms()
-        print("Connected to printer on: ", printer.usb.get_port_name())
+        with Printer() as printer:
+            printer.startup()
+            printer.init_comms()
+            print("Connected to printer on: ", printer.usb.get_port_name())
 
-        # Start self-test and capture
-        print('Begining self test')
+            # Start self-test and capture
+            print('Begining self test')
 
-        printer.enable_debug()
-        printer.print_selftest()
+            printer.enable_debug()
+            printer.print_selftest()
 
-        printer.wait_until_print_complete()
+            printer.wait_until_print_complete()
 
-        selftest_printout = printer.get_last_printout()
+            selftest_printout = printer.get_last_printout()
 
-        selftest_printout.save(Path(printer_out_dir, 'selftest.png'))
+            selftest_printout.save(Path(printer_out_dir, 'selftest.png'))
 
-        print(pytesseract.image_to_string(printout.convert_to_bilevel(selftest_printout)))
+            print(pytesseract.image_to_string(printout.convert_to_bilevel(selftest_printout)))
 
-        print('--------------------')
-        print('Complete')
-        print()
+            print('--------------------')
+            print('Complete')
+            print()
 
     except (AnlayserNotFound, PrinterNotFound) as exc:
         print('Error -', exc)
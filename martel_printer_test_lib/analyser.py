@@ -1,5 +1,6 @@
 from pathlib import Path
 import os
+import weakref
 
 from saleae import automation
 from saleae.automation.errors import Logic2AlreadyRunningError
@@ -24,8 +25,8 @@ class Analyser:
         self.current_capture: automation.Capture | None = None
         self.captures: list[automation.Capture] = []
 
-    def __del__(self):
-        self.end()
+        # Closes the manager if the analyser is never ended, without keeping it alive.
+        self.close_manager: weakref.finalize | None = None
 
     def __enter__(self):
         self.start()
@@ -41,6 +42,8 @@ class Analyser:
             except Logic2AlreadyRunningError:
                 self.manager = automation.Manager.connect()
 
+            self.close_manager = weakref.finalize(self, self.manager.close)
+
         devices = self.manager.get_devices()
         if len(devices) < 1:
             raise AnlayserNotFound('Cannot find the analyser')
@@ -49,7 +52,8 @@ class Analyser:
 
     def end(self):
         if self.manager is not None:
-                self.manager = self.manager.close()
+            self.close_manager()
+            self.manager = None
 
     def is_running(self) -> bool:
         return True if self.manager is not None else False
@@ -1,24 +1,25 @@
 import serial
-import serial.tools.list_ports
 from enum import Enum
+import struct
+import time
 
 from robot.api.deco import keyword, library
-from PIL import Image
 
 from printer_mech import LTPD245Emulator
 from printout import Printout
 
 
 PRINTER_VID = 0x483
-PRINTER_PID = [0x1, 0x5740]
+PRINTER_PID = frozenset({0x1, 0x5740})
 
 ESC = 0x1B
 NULL = 0
-ENABLE_DEBUG = bytearray([ESC, NULL, NULL, ord('D'), NULL])
-DEBUG_PRINT_SELFTEST = bytearray([ESC, NULL, NULL, ord('S'), 8])
-DEBUG_SET_OPTION = bytearray([ESC, NULL, NULL, ord('O')])
+ENABLE_DEBUG = bytes([ESC, NULL, NULL, ord('D'), NULL])
+DEBUG_PRINT_SELFTEST = bytes([ESC, NULL, NULL, ord('S'), 8])
+DEBUG_SET_OPTION = bytes([ESC, NULL, NULL, ord('O')])
+DEBUG_SET_OPTION_FRAME = struct.Struct('4sBB')
 
-COMMAND_RESET = bytearray([ESC, ord('@')])
+COMMAND_RESET = bytes([ESC, ord('@')])
 
 class Interface(Enum):
     USB = 1
@@ -26,6 +27,35 @@ class Interface(Enum):
     INFRARED = 3
     BLUETOOTH = 4
 
+# Serial port enumeration is slow on Windows, so share one scan between
+# calls made in quick succession.
+COMPORTS_CACHE_TTL = 2.0
+
+_comports_cache: tuple[float, list] | None = None
+
+
+def _cached_comports() -> tuple[list, bool]:
+    """
+    Return the serial ports and whether they were just scanned rather than cached.
+    """
+    global _comports_cache
+
+    now = time.monotonic()
+    if _comports_cache is None or now - _comports_cache[0] >= COMPORTS_CACHE_TTL:
+        # Imported here as the platform specific enumeration backend is only
+        # needed once a connection is actually made.
+        import serial.tools.list_ports
+        _comports_cache = (now, serial.tools.list_ports.comports())
+        return (_comports_cache[1], True)
+
+    return (_comports_cache[1], False)
+
+
+def _clear_comports_cache():
+    global _comports_cache
+    _comports_cache = None
+
+
 class PrinterNotFound(Exception):
     pass
 
@@ -34,19 +64,20 @@ class InterfaceNotAvailable(Exception):
 
 @library(scope='GLOBAL')
 class Printer:
+    __slots__ = ('mech_emulator', 'usb', 'interfaces')
 
     def __init__(self):
         self.mech_emulator = LTPD245Emulator()
         self.usb = PrinterInterfaceUSB()
-    
-    def __del__(self):
-        self.shutdown()
+        self.interfaces: dict[Interface, PrinterInterfaceUSB] = {
+            Interface.USB: self.usb,
+        }
 
     def __enter__(self):
         return self
 
     def __exit__(self, exc_type, exc_value, exc_traceback):
-        self.__del__()
+        self.shutdown()
 
     @keyword('Startup Printer')
     def startup(self):
@@ -54,8 +85,13 @@ class Printer:
 
     @keyword('Shutdown Printer')
     def shutdown(self):
-        self.mech_emulator.end()
-        self.usb.disconnect()
+        # Release the serial ports even if the emulator fails to shut down.
+        try:
+            self.mech_emulator.end()
+        finally:
+            for comm_interface in self.interfaces.values():
+                comm_interface.disconnect()
+            _clear_comports_cache()
 
     @keyword('Wait Until Print Complete')
     def wait_until_print_complete(self):
@@ -67,24 +103,26 @@ class Printer:
 
     @keyword(name='Connect To Printer Comm Interfaces')
     def init_comms(self):
-        self.usb.connect()
+        for comm_interface in self.interfaces.values():
+            comm_interface.connect()
     
     @keyword(name='Disconnect From Printer Comm Interfaces')
     def deinit_comms(self):
-        self.usb.disconnect()
+        for comm_interface in self.interfaces.values():
+            comm_interface.disconnect()
 
     @keyword('Print ${text}')
     def print(self, text: str, interface: Interface = Interface.USB):
+        interface = Interface(interface)
+        try:
+            comm_interface = self.interfaces[interface]
+        except KeyError as exc:
+            raise InterfaceNotAvailable(
+                f'Cannot print over the {interface.name} interface. '
+                'The interface is not available.') from exc
+
         self.mech_emulator.start()
-        match interface:
-            case Interface.USB:
-                self.usb.send(text.encode(encoding='ascii'))
-            case Interface.RS232:
-                raise InterfaceNotAvailable()
-            case Interface.INFRARED:
-                raise InterfaceNotAvailable()
-            case Interface.BLUETOOTH:
-                raise InterfaceNotAvailable()
+        comm_interface.send(text.encode(encoding='ascii'))
 
     @keyword(name='Reset Printer')
     def reset(self):
@@ -101,30 +139,39 @@ class Printer:
 
     @keyword(name='Set Printer Option')
     def set_option(self, option: int, setting: int):
-        self.usb.send(DEBUG_SET_OPTION + bytes([option, setting]))
+        self.usb.send(DEBUG_SET_OPTION_FRAME.pack(DEBUG_SET_OPTION, option, setting))
 
 class PrinterInterfaceUSB():
     def __init__(self):
         self.port_info = None
         self.port = None
-    
-    def __del__(self):
-        if self.port is not None and self.port.isOpen():
-            self.port.close()
 
     def connect(self):
-        ports = serial.tools.list_ports.comports()
+        (ports, fresh) = _cached_comports()
         try:
-            self.port_info = next(
-                port for port in ports if port.vid == PRINTER_VID and port.pid in PRINTER_PID)
+            self._open_printer_port(ports)
+        except (PrinterNotFound, serial.SerialException):
+            if fresh:
+                raise
+
+            # The cached port list may be stale, retry with a fresh one.
+            _clear_comports_cache()
+            (ports, _) = _cached_comports()
+            self._open_printer_port(ports)
 
-            self.port = serial.Serial(self.port_info.name)
+    def _open_printer_port(self, ports: list):
+        try:
+            port_info = next(
+                port for port in ports if port.vid == PRINTER_VID and port.pid in PRINTER_PID)
         except StopIteration as exc:
             raise PrinterNotFound(
                 'Cannot find the printers serial port') from exc
+
+        self.port = serial.Serial(port_info.device)
+        self.port_info = port_info
     
     def disconnect(self):
-        if self.port is not None and self.port.isOpen():
+        if self.port is not None and self.port.is_open:
             self.port = self.port.close()
             self.port_info = None
             
@@ -134,11 +181,11 @@ class PrinterInterfaceUSB():
             return self.port_info.name
 
     def send(self, data: bytes):
-        if self.port is not None and self.port.isOpen():
+        if self.port is not None and self.port.is_open:
             self.port.write(data)
             self.port.flush()
 
     def flush(self):
-        if self.port is not None and self.port.isOpen():
+        if self.port is not None and self.port.is_open:
             self.port.flush()
     
\ No newline at end of file
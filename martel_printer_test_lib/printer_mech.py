@@ -1,19 +1,21 @@
-from collections import deque
-from operator import add
 from pathlib import Path
-import csv
 import math
-import time
 import tempfile
 
 import cv2
 import numpy
-from numpy import ndarray, uint8
+from numpy import ndarray, uint8, uint16
 
 from analyser import Analyser
 from printout import Printout
 
 DOTS_PER_LINE = 384
+PAPER_INITIAL_CAPACITY = 64
+
+# Burn time is accumulated in fixed point, in 1/256ths of a grey level.
+DARKNESS_PER_SECOND = 25000.0
+BURN_TICKS_PER_SECOND = DARKNESS_PER_SECOND * 256
+MAX_BURN_TICKS = numpy.iinfo(uint16).max
 
 """"
 # => Feed paper (forward)
@@ -42,14 +44,11 @@ class LTPD245Emulator:
 
         self.outdir = tempfile.TemporaryDirectory()
 
-    def __del__(self):
-        self.end()
-
     def __enter__(self):
         return self
 
     def __exit__(self, exc_type, exc_value, exc_traceback):
-        self.__del__()
+        self.end()
 
     def start(self):
         if not self.analyser.is_running():
@@ -64,8 +63,9 @@ class LTPD245Emulator:
     def wait_until_print_complete(self):
         self.analyser.wait_for_completion()
 
-        record_path = Path(self.outdir.name, time.strftime(
-            '%Y%m%d-%H%M%S')).with_suffix('.csv')
+        # Records only live in this emulator's temporary directory, so numbering them is
+        # enough to keep captures taken within the same second from overwriting each other.
+        record_path = Path(self.outdir.name, f'record-{len(self.records)}.csv')
         self.analyser.export_capture(record_path)
         self.records.append(record_path)
 
@@ -77,13 +77,14 @@ class LTPD245Emulator:
     def generate_image_from_record(self, record: Path) -> Printout:
         with MechInputRecords(record) as mech_record:
             print_mech = PrintMechState(next(mech_record))
-            for state in mech_record:
-                print_mech.update(state)
+            print_mech.replay(mech_record)
 
         return print_mech.get_printout()
 
 
 class MechInput:
+    __slots__ = ('timestamp', 'spi_clock', 'spi_data', 'latch', 'dst', 'motor_state')
+
     def __init__(self, state: list[str]):
         self.timestamp = float(state[0])
         self.spi_clock = int(state[1])
@@ -97,33 +98,74 @@ class MechInput:
 
 
 class MechInputRecords:
+    """
+    Recorded print mechanism inputs, loaded from an analyser CSV export.
+
+    The whole record is parsed in one pass into typed columns, one per input. Iterating
+    over the records yields a MechInput for each sample.
+    """
+
     def __init__(self, csv_path: Path):
-        self.file = open(csv_path, 'r', encoding='utf-8')
-        self.history = csv.reader(self.file)
-        next(self.history)  # Skip the header row.
+        # Skip the header row.
+        data = numpy.loadtxt(csv_path, delimiter=',', skiprows=1, ndmin=2)
+
+        # Copy each column out so the parsed table is not kept alive.
+        self.timestamp = numpy.ascontiguousarray(data[:, 0])
+        self.spi_clock = data[:, 1].astype(uint8)
+        self.spi_data = data[:, 2].astype(uint8)
+        self.latch = data[:, 3].astype(uint8)
+        self.dst = data[:, 4].astype(uint8)
+        self.motor_state = (data[:, 6].astype(uint8) << 1) | data[:, 5].astype(uint8)
+
+        self.position = 0
 
     def __enter__(self):
         return self
 
     def __exit__(self, exc_type, exc_value, exc_traceback):
-        self.file.close()
+        pass
+
+    def __len__(self) -> int:
+        return len(self.timestamp)
+
+    def __getitem__(self, index: int) -> MechInput:
+        motor_state = int(self.motor_state[index])
+        return MechInput([
+            self.timestamp[index],
+            self.spi_clock[index],
+            self.spi_data[index],
+            self.latch[index],
+            self.dst[index],
+            motor_state & 1,
+            motor_state >> 1,
+        ])
 
     def __iter__(self):
         return self
 
     def __next__(self) -> MechInput:
-        return MechInput(next(self.history))
+        if self.position >= len(self):
+            raise StopIteration
+
+        mech_input = self[self.position]
+        self.position += 1
+        return mech_input
 
 
 class PrintMechState:
     """
     Simulation of the current state of the printer's print mechanism.
     """
+    __slots__ = ('last_input', 'shift_register', 'shift_head', 'latch_register', 'paper',
+                 'burn_time', 'motor_steps')
 
     def __init__(self, initial_input: MechInput):
         self.last_input = initial_input
-        self.shift_register = deque([0] * DOTS_PER_LINE, maxlen=DOTS_PER_LINE)
-        self.latch_register = [0] * DOTS_PER_LINE
+        # Ring buffer. shift_head is the position of the oldest bit, which is
+        # overwritten by the next bit shifted in.
+        self.shift_register = numpy.zeros(DOTS_PER_LINE, dtype=uint8)
+        self.shift_head = 0
+        self.latch_register = numpy.zeros(DOTS_PER_LINE, dtype=uint8)
         self.paper = PaperBuffer()
 
         self.burn_time = 0.0
@@ -138,34 +180,116 @@ class PrintMechState:
         # Data in the shift register is transfered to the latch
         # register when the latch is pulled low.
         if self.last_input.latch == 1 and mech_input.latch == 0:
-            self.burn_shift_register()
-            self.latch_register = list(self.shift_register)
+            self.latch_shift_register()
 
         # Data bits are valid on the clock's rising edge.
         # The bits get shifted in to the shift register.
         if mech_input.spi_clock == 1 and self.last_input.spi_clock == 0:
-            self.shift_register.append(mech_input.spi_data)
+            self.shift_in(mech_input.spi_data)
 
-        # One dot line is 4 steps.
         if mech_input.motor_state != self.last_input.motor_state:
-            self.motor_steps += 2  # 2 steps every state change
-            if self.motor_steps == 2:
-                self.burn_shift_register(between_lines=True)
-            elif self.motor_steps >= 4:
-                self.burn_shift_register()
-                self.advance_line()
-                self.motor_steps = 0
+            self.step_motor()
 
         self.last_input = mech_input
 
+    def replay(self, records: MechInputRecords):
+        """
+        Update the state with every recorded input following the first, which must be the
+        state's current input.
+
+        Gives the same result as calling update() with each input in turn, but only the
+        inputs at which a latch or motor edge occurs are visited. DST burn time is integrated
+        over the whole record up front, and the data bits clocked in to the shift register are
+        gathered in one pass so that each latch takes the last dot line's worth of them.
+
+        Burn times are taken as differences of the integrated total rather than summed step
+        by step, so rounding can leave a burn one tick away from what update() gives. Which
+        dots are burned is always the same.
+        """
+        if len(records) < 2:
+            return
+
+        timestamp = records.timestamp
+        clock = records.spi_clock
+        latch = records.latch
+        motor = records.motor_state
+
+        # Total DST burn time from the first input up to each input.
+        burned = numpy.zeros(len(records))
+        numpy.cumsum(numpy.diff(timestamp) * records.dst[:-1], out=burned[1:])
+
+        # Every bit shifted in, oldest first, following the current shift register contents.
+        clock_rises = numpy.flatnonzero((clock[:-1] == 0) & (clock[1:] == 1)) + 1
+        shifted_bits = numpy.concatenate((
+            self.shift_register[self.shift_head:],
+            self.shift_register[:self.shift_head],
+            records.spi_data[clock_rises]))
+
+        latch_falling = numpy.zeros(len(records), dtype=bool)
+        latch_falling[1:] = (latch[:-1] == 1) & (latch[1:] == 0)
+        motor_changed = numpy.zeros(len(records), dtype=bool)
+        motor_changed[1:] = motor[:-1] != motor[1:]
+
+        events = numpy.flatnonzero(latch_falling | motor_changed)
+        # Bits shifted in before each event. The latch is handled before a clock edge on the
+        # same input.
+        shifted = numpy.searchsorted(clock_rises, events)
+
+        # Burn time accumulated before the first input, or since the last burn.
+        burn_offset = self.burn_time
+        for i, bits in zip(events.tolist(), shifted.tolist()):
+            self.burn_time = burn_offset + burned[i]
+
+            if latch_falling[i]:
+                self.burn_shift_register()
+                numpy.copyto(self.latch_register, shifted_bits[bits:bits + DOTS_PER_LINE])
+            if motor_changed[i]:
+                self.step_motor()
+
+            burn_offset = self.burn_time - burned[i]
+
+        self.burn_time = burn_offset + burned[-1]
+        self.shift_register = shifted_bits[-DOTS_PER_LINE:].copy()
+        self.shift_head = 0
+        self.last_input = records[-1]
+
+    def latch_shift_register(self):
+        """
+        Burn the current latch register, then replace it with the shift register.
+        """
+        self.burn_shift_register()
+        # Unroll the ring into the latch, oldest bit first.
+        wrap = DOTS_PER_LINE - self.shift_head
+        self.latch_register[:wrap] = self.shift_register[self.shift_head:]
+        self.latch_register[wrap:] = self.shift_register[:self.shift_head]
+
+    def shift_in(self, bit: int):
+        """
+        Shift a data bit in to the shift register.
+        """
+        self.shift_register[self.shift_head] = bit
+        self.shift_head = (self.shift_head + 1) % DOTS_PER_LINE
+
+    def step_motor(self):
+        """
+        Handle a change in the motor state.
+
+        One dot line is 4 steps.
+        """
+        self.motor_steps += 2  # 2 steps every state change
+        if self.motor_steps == 2:
+            self.burn_shift_register(between_lines=True)
+        elif self.motor_steps >= 4:
+            self.burn_shift_register()
+            self.advance_line()
+            self.motor_steps = 0
+
     def burn_shift_register(self, between_lines=False):
         """
         Burn a dot line into the paper, simulating activation
         of the thermal head.
         """
-        burn_buffer = [
-            float(bit) * self.burn_time for bit in self.latch_register]
-        self.paper.burn_line(burn_buffer, between_lines=between_lines)
+        self.paper.burn_line(self.latch_register, self.burn_time, between_lines=between_lines)
         self.burn_time = 0.0
 
     def advance_line(self):
@@ -188,14 +312,27 @@ class PaperBuffer:
 
     The paper is divided into a grid where each cell is 1 thermal head 'dot' in size.
 
-    Each element contains the ammount of time a thermal head 'dot' has burned over a cell.
+    Each element contains the ammount of time a thermal head 'dot' has burned over a cell, in
+    fixed point ticks of 1/256th of a grey level. Cells saturate rather than wrap once fully
+    burned.
+
+    Lines are stored in a preallocated array which doubles in size whenever it runs out of
+    room, rather than being reallocated for every new line.
     """
 
     def __init__(self):
         """
         Initialise the paper buffer with 2 lines.
         """
-        self.buffer = [[0.0] * DOTS_PER_LINE, [0.0] * DOTS_PER_LINE]
+        self._buffer = numpy.zeros((PAPER_INITIAL_CAPACITY, DOTS_PER_LINE), dtype=uint16)
+        self._length = 2
+
+    @property
+    def buffer(self) -> ndarray:
+        """
+        View of the lines currently on the paper.
+        """
+        return self._buffer[:self._length]
 
     def new_line(self):
         """
@@ -203,9 +340,14 @@ class PaperBuffer:
 
         Visualy, this line is located at the bottom of the paper.
         """
-        self.buffer.append([0.0] * DOTS_PER_LINE)
+        if self._length == self._buffer.shape[0]:
+            grown = numpy.zeros((self._length * 2, DOTS_PER_LINE), dtype=uint16)
+            grown[:self._length] = self._buffer
+            self._buffer = grown
+
+        self._length += 1
 
-    def burn_line(self, line_buffer: list[float], between_lines=False):
+    def burn_line(self, dots: ndarray | list[int], burn_time: float, between_lines=False):
         """
         Burn a line into the paper.
 
@@ -214,12 +356,20 @@ class PaperBuffer:
 
         It takes 4 motor steps to move from one line to the next. The printer actually moves 2
         steps at once, therefore if the thermal head is between 2 lines, both will be burned.
+
+        Each dot that is set is burned for the given time, in seconds. Any burn, however
+        short, darkens a dot.
         """
-        if not between_lines:
-            self.buffer[-2] = list(map(add, self.buffer[-2], line_buffer))
-        else:
-            self.buffer[-2] = list(map(add, self.buffer[-2], line_buffer))
-            self.buffer[-1] = list(map(add, self.buffer[-1], line_buffer))
+        ticks = min(max(math.ceil(burn_time * BURN_TICKS_PER_SECOND), 0), MAX_BURN_TICKS)
+        if ticks == 0:
+            return
+
+        ticks = numpy.multiply(dots, ticks, dtype=uint16, casting='unsafe')
+
+        lines = (self._length - 2, self._length - 1) if between_lines else (self._length - 2,)
+        for index in lines:
+            line = self._buffer[index]
+            line += numpy.minimum(ticks, MAX_BURN_TICKS - line)
 
     def as_printout(self) -> Printout:
         """
@@ -227,24 +377,15 @@ class PaperBuffer:
 
         The method of calculating the darkness of a burned dot needs improvement.
         """
-        # img = Image.new('L', (DOTS_PER_LINE, len(self.buffer)))
-        # img = ndarray((len(self.buffer), DOTS_PER_LINE), dtype=uint8)
-        data = [max(0, 255 - int(math.ceil(pixel * 25000.0)))
-                for row in self.buffer for pixel in row]
-
-        img = numpy.asarray(data, uint8)
-        img = numpy.reshape(img, (-1, DOTS_PER_LINE))
-
+        # Allocate the bordered image up front and draw the paper straight into its middle.
         border = int(DOTS_PER_LINE * 0.10)
-        img = cv2.copyMakeBorder(
-            img,
-            top=border,
-            bottom=border,
-            left=border,
-            right=border,
-            borderType=cv2.BORDER_CONSTANT,
-            dst=img,
-            value=255
-        )
+        (length, width) = self.buffer.shape
+        img = numpy.full((length + border * 2, width + border * 2), 255, dtype=uint8)
+        paper = img[border:border + length, border:border + width]
+
+        # Round the ticks up to whole grey levels so that any burn at all leaves a mark. The
+        # addition saturates, so fully burned dots still come out black.
+        levels = cv2.add(self.buffer, 255) >> 8
+        numpy.subtract(255, levels, out=paper, casting='unsafe')
 
         return Printout(img)
@@ -1,6 +1,5 @@
 from pathlib import Path
 import os
-import itertools
 
 import cv2
 import numpy
@@ -17,6 +16,16 @@ BLACK_BGR = (0, 0, 0)
 GREEN_BGR = (0, 255, 0)
 RED_BGR = (0, 0, 255)
 
+# Diff colours indexed by which of the 2 compared printouts are black at a pixel.
+# If it has been added, make it green in the diff.
+# If removed, make it red in the diff.
+DIFF_BGR = numpy.array([
+    WHITE_BGR,  # Neither.
+    RED_BGR,    # Removed.
+    GREEN_BGR,  # Added.
+    BLACK_BGR,  # Both.
+], dtype=uint8)
+
 
 # Exceptions
 
@@ -48,8 +57,37 @@ class Printout:
 
         self.img = img
 
-    def __del__(self):
-        pass
+    @property
+    def img(self) -> ndarray:
+        return self._img
+
+    @img.setter
+    def img(self, img: ndarray):
+        self._img = img
+        self._ink_mask = None
+        self._rgb = None
+
+    @property
+    def ink_mask(self) -> ndarray:
+        """
+        Mask of the printed pixels, treating all gray pixels as black.
+
+        Printed pixels are 255, unprinted pixels 0. The mask is created on first use and kept
+        until the image changes.
+        """
+        if self._ink_mask is None:
+            (_, self._ink_mask) = cv2.threshold(
+                self.img, 254, WHITE_GS, cv2.THRESH_BINARY_INV)
+        return self._ink_mask
+
+    @property
+    def rgb(self) -> ndarray:
+        """
+        3 channel copy of the image, created on first use and kept until the image changes.
+        """
+        if self._rgb is None:
+            self._rgb = cv2.cvtColor(self.img, cv2.COLOR_GRAY2RGB)
+        return self._rgb
 
     def __iter__(self) -> 'PrintoutLinesIter':
         return PrintoutLinesIter(self.img)
@@ -59,13 +97,13 @@ class Printout:
         if not filepath.exists():
             raise FileNotFoundError('Cannot find file: {}'.format(filepath))
 
-        return cls(cv2.imread(str(filepath.absolute()), cv2.IMREAD_GRAYSCALE))
+        return cls(cv2.imread(str(filepath), cv2.IMREAD_GRAYSCALE))
 
     def get_image(self) -> ndarray:
         return self.img
 
     def save(self, path: Path):
-        cv2.imwrite(str(path.absolute()), self.img)
+        cv2.imwrite(str(path), self.img)
 
     @property
     def length(self) -> int:
@@ -87,13 +125,18 @@ class Printout:
         """
         if self.length > new_length:
             raise SizeError(
-                'Cannot extend printout as it is already longer than the given length.',
-                'printout length: ', self.length)
-
-        tmp = ndarray((new_length, self.img.shape[1]), dtype=self.img.dtype)
-        tmp[:self.img.shape[0], :] = self.img
-        tmp[self.img.shape[0]:, :] = WHITE_GS
-        self.img = tmp
+                'Cannot extend printout as it is already longer than the given length. '
+                f'Printout length: {self.length}, given length: {new_length}')
+
+        self.img = cv2.copyMakeBorder(
+            self.img,
+            top=0,
+            bottom=new_length - self.length,
+            left=0,
+            right=0,
+            borderType=cv2.BORDER_CONSTANT,
+            value=WHITE_GS
+        )
 
     def extend_width_to(self, new_width: int):
         """
@@ -103,19 +146,22 @@ class Printout:
         """
         if self.width > new_width:
             raise SizeError(
-                'Cannot widen printout as it is already wider than the given width.',
-                'printout length: ', self.width)
-
-        tmp = ndarray((self.length, new_width), dtype=self.img.dtype)
-
-        # Horizontal start and end position of self within the new image.
-        self_start = int((new_width - self.width) / 2)
-        self_end = int(self_start + self.width)
-
-        tmp[:, :self_start] = WHITE_GS
-        tmp[:, self_start:self_end] = self.img
-        tmp[:, self_end:] = WHITE_GS
-        self.img = tmp
+                'Cannot widen printout as it is already wider than the given width. '
+                f'Printout width: {self.width}, given width: {new_width}')
+
+        # Whitespace either side of self within the new image.
+        left = (new_width - self.width) // 2
+        right = new_width - self.width - left
+
+        self.img = cv2.copyMakeBorder(
+            self.img,
+            top=0,
+            bottom=0,
+            left=left,
+            right=right,
+            borderType=cv2.BORDER_CONSTANT,
+            value=WHITE_GS
+        )
 
     def compare_with(self, other: 'Printout') -> float:
         """
@@ -129,29 +175,32 @@ class Printout:
         ----------
         - Raises SizeError if the prinouts are not the same size.
         """
-        # Crop both images.
-        # Make pure white pixels black, make grey and black pixels white.
-        (_, print1) = cv2.threshold(self.img, 254, WHITE_GS, cv2.THRESH_BINARY_INV)
+        # A printout always matches itself.
+        if self.img is other.img:
+            return 1.0
+
+        # The ink masks both locate the printed area and binarise it, so the cropped masks
+        # can be compared directly.
+        print1 = self.ink_mask
         x, y, w, h = cv2.boundingRect(print1)
-        print1 = self.img[y:y+h, x:x+w]
+        print1 = print1[y:y+h, x:x+w]
 
-        (_, print2) = cv2.threshold(other.img, 254, WHITE_GS, cv2.THRESH_BINARY_INV)
+        print2 = other.ink_mask
         x, y, w, h = cv2.boundingRect(print2)
-        print2 = other.img[y:y+h, x:x+w]
+        print2 = print2[y:y+h, x:x+w]
 
         if print1.shape != print2.shape:
             raise SizeError(
-                'Cannot compare printouts that are not the same size.',
-                'This size: ', print1.shape,
-                'Other size: ', print2.shape
+                'Cannot compare printouts that are not the same size. '
+                f'This size: {print1.shape}, other size: {print2.shape}'
             )
 
-        # Convert all gray pixels to black.
-        (_, print1) = cv2.threshold(print1, 254, WHITE_GS, cv2.THRESH_BINARY)
-        (_, print2) = cv2.threshold(print2, 254, WHITE_GS, cv2.THRESH_BINARY)
+        # 2 blank printouts match.
+        if print1.size == 0:
+            return 1.0
 
-        pixels_different = numpy.sum(print1 != print2)
-        similarity = 1 - (pixels_different / (self.width * self.length))
+        pixels_different = cv2.countNonZero(cv2.compare(print1, print2, cv2.CMP_NE))
+        similarity = 1 - (pixels_different / print1.size)
 
         return similarity
 
@@ -160,33 +209,15 @@ class Printout:
         """
         if self.img.shape != other.img.shape:
             raise SizeError(
-                'Cannot create diff for printouts that are not the same size.',
-                'This size: ', self.img.shape,
-                'Other size: ', other.img.shape
+                'Cannot create diff for printouts that are not the same size. '
+                f'This size: {self.img.shape}, other size: {other.img.shape}'
             )
 
-        # Convert all gray pixels to black.
-        (_, print1) = cv2.threshold(self.img, 254, WHITE_GS, cv2.THRESH_BINARY)
-        (_, print2) = cv2.threshold(other.img, 254, WHITE_GS, cv2.THRESH_BINARY)
-        black, white = 0, 255
-
-        # Compare pixels between the 2 inputs.
-        # If it has been added, make it green in the diff.
-        # If removed, make it red in the diff.
-        diff = numpy.full((self.length, self.width, 3), WHITE_BGR, dtype=uint8)
-        diff_width = diff.shape[1]
-        diff_height = diff.shape[0]
-        for pos in itertools.product(range(0, diff_height-1), range(0, diff_width-1)):
-            if print1[pos] == WHITE_GS and print2[pos] == BLACK_GS:
-                diff[pos] = GREEN_BGR
-            elif print1[pos] == BLACK_GS and print2[pos] == WHITE_GS:
-                diff[pos] = RED_BGR
-            elif print1[pos] == BLACK_GS and print2[pos] == BLACK_GS:
-                diff[pos] = BLACK_BGR
-            else:
-                pass  # White
-
-        return diff
+        # Compare pixels between the 2 inputs, treating all gray pixels as black.
+        # Bit 0 of the index is set where this printout is black, bit 1 where the other is.
+        index = (self.ink_mask & 1) | (other.ink_mask & 2)
+
+        return DIFF_BGR[index]
 
 
 class PrintoutLinesIter:
@@ -195,26 +226,19 @@ class PrintoutLinesIter:
             raise FormatError('Printout must be single channel 8bpp format.')
 
         self.img = img
-        self.row = 0
-        self.max_row = img.shape[0] - 1
 
-    def __next__(self) -> cv2.Mat:
-        # Find the start of the text line.
-        while numpy.all(self.img[self.row] == WHITE_GS):
-            self.row += 1
-            if self.row > self.max_row:
-                raise StopIteration
-        
-        # Copy the text row into a new image.
-        text_row = []
-        while not numpy.all(self.img[self.row] == WHITE_GS):
-            text_row.append(self.img[self.row])
-            self.row += 1
-            if self.row > self.max_row:
-                raise StopIteration
+        # Text lines are runs of rows that are not entirely white. Padding with blank rows
+        # either side means each run has both a start and an end edge.
+        blank_rows = img.min(axis=1) == WHITE_GS
+        edges = numpy.flatnonzero(numpy.diff(blank_rows, prepend=True, append=True))
+        self.lines = iter(edges.reshape(-1, 2).tolist())
 
-        return numpy.asarray(text_row)
+    def __iter__(self) -> 'PrintoutLinesIter':
+        return self
 
+    def __next__(self) -> ndarray:
+        (start, end) = next(self.lines)
+        return self.img[start:end]
 
 
 @library(scope='SUITE')
@@ -267,7 +291,7 @@ class ComparisonLibrary:
 
         # Equilize the printout sizes.
         if self.sample.width < printout.width:
-            self.sample.extend_width_to(printout.length)
+            self.sample.extend_width_to(printout.width)
         if printout.width < self.sample.width:
             printout.extend_width_to(self.sample.width)
 
@@ -284,10 +308,8 @@ class ComparisonLibrary:
         shape = (self.sample.length, print_width * 3, 3)
         comparison = numpy.full(shape, WHITE_BGR, dtype=uint8)
 
-        comparison[:, :print_width] = cv2.cvtColor(
-            self.sample.get_image(), cv2.COLOR_GRAY2RGB)
-        comparison[:, print_width:(
-            print_width * 2)] = cv2.cvtColor(printout.get_image(), cv2.COLOR_GRAY2RGB)
+        comparison[:, :print_width] = self.sample.rgb
+        comparison[:, print_width:(print_width * 2)] = printout.rgb
         comparison[:, (print_width * 2):] = diff_image
 
         # Label the images.
@@ -314,7 +336,7 @@ class ComparisonLibrary:
         )
 
         cv2.imwrite(
-            str(Path(self.compare_out_dir, filename).absolute()), comparison)
+            str(Path(self.compare_out_dir, filename)), comparison)
 
     @keyword('Save Printout')
     def save_printout(self, printout: Printout, filename: str):
@@ -0,0 +1,67 @@
+import unittest
+from unittest import mock
+from types import SimpleNamespace
+
+import serial
+import serial.tools.list_ports
+
+import printer
+from printer import PrinterInterfaceUSB, PrinterNotFound, PRINTER_VID
+
+PRINTER_PORT = SimpleNamespace(vid=PRINTER_VID, pid=0x5740, device='COM3', name='COM3')
+OTHER_PORT = SimpleNamespace(vid=0x1234, pid=0x1, device='COM1', name='COM1')
+
+
+class TestPrinterInterfaceUSB(unittest.TestCase):
+    def setUp(self):
+        printer._clear_comports_cache()
+        self.addCleanup(printer._clear_comports_cache)
+
+        self.comports = mock.Mock(return_value=[OTHER_PORT, PRINTER_PORT])
+        patcher = mock.patch.object(serial.tools.list_ports, 'comports', self.comports)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.serial = mock.Mock()
+        patcher = mock.patch.object(serial, 'Serial', self.serial)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.usb = PrinterInterfaceUSB()
+
+    def test_connect_cache_hit(self):
+        self.usb.connect()
+        self.usb.connect()
+
+        self.assertEqual(self.comports.call_count, 1, 'Cached port list not reused')
+        self.assertEqual(self.usb.get_port_name(), 'COM3', 'Incorrect port')
+
+    def test_connect_stale_cache(self):
+        self.comports.return_value = [OTHER_PORT]
+        printer._cached_comports()
+        self.comports.return_value = [OTHER_PORT, PRINTER_PORT]
+
+        self.usb.connect()
+
+        self.assertEqual(self.comports.call_count, 2, 'Stale port list not rescanned')
+        self.assertEqual(self.usb.get_port_name(), 'COM3', 'Incorrect port')
+
+    def test_connect_printer_missing(self):
+        self.comports.return_value = [OTHER_PORT]
+
+        with self.assertRaises(PrinterNotFound):
+            self.usb.connect()
+
+        self.assertEqual(self.comports.call_count, 1, 'Fresh port list rescanned')
+        self.assertIsNone(self.usb.get_port_name(), 'Port set without a printer')
+
+    def test_connect_port_fails_to_open(self):
+        self.serial.side_effect = serial.SerialException('Access denied')
+        printer._cached_comports()
+
+        with self.assertRaises(serial.SerialException):
+            self.usb.connect()
+
+        self.assertEqual(self.comports.call_count, 2, 'Stale port list not rescanned')
+        self.assertIsNone(self.usb.get_port_name(), 'Port set when it failed to open')
+
@@ -1,7 +1,14 @@
 import unittest
 import itertools
+import random
+import tempfile
+from pathlib import Path
 
-from printer_mech import PaperBuffer
+import numpy
+
+from printer_mech import (PaperBuffer, PrintMechState, MechInputRecords, DOTS_PER_LINE,
+                          MAX_BURN_TICKS)
+from printout import WHITE_GS
 
 
 class TestPaperBuffer(unittest.TestCase):
@@ -17,3 +24,114 @@ class TestPaperBuffer(unittest.TestCase):
             self.paper_buffer.new_line()
         self.assertEqual(len(self.paper_buffer.buffer), 8,
                          'Incorrect paper buffer length')
+
+    def test_new_line_past_capacity(self):
+        self.paper_buffer.burn_line([1] * DOTS_PER_LINE, 1.0)
+        for _ in itertools.repeat(None, 200):
+            self.paper_buffer.new_line()
+
+        self.assertEqual(len(self.paper_buffer.buffer), 202,
+                         'Incorrect paper buffer length')
+        self.assertTrue((self.paper_buffer.buffer[0] == MAX_BURN_TICKS).all(),
+                        'Burned line lost when the buffer grew')
+        self.assertEqual(self.paper_buffer.buffer[2:].sum(), 0,
+                         'New lines are not blank')
+
+    def test_burn_line(self):
+        line = [1] * DOTS_PER_LINE
+        self.paper_buffer.burn_line(line, 1e-5)
+        self.paper_buffer.burn_line(line, 1e-5, between_lines=True)
+
+        current, following = self.paper_buffer.buffer[0], self.paper_buffer.buffer[1]
+        self.assertTrue((following > 0).all(), 'Incorrect burn on the next line')
+        self.assertTrue((current == following * 2).all(), 'Incorrect burn on the current line')
+
+    def test_burn_line_saturates(self):
+        line = [1] * DOTS_PER_LINE
+        self.paper_buffer.burn_line(line, 1.0)
+        self.paper_buffer.burn_line(line, 1.0)
+
+        self.assertTrue((self.paper_buffer.buffer[0] == MAX_BURN_TICKS).all(),
+                        'Burned line did not saturate')
+
+    def test_as_printout(self):
+        self.paper_buffer.burn_line([1] * 8 + [0] * (DOTS_PER_LINE - 8), 1e-9)
+        img = self.paper_buffer.as_printout().img
+        border = int(DOTS_PER_LINE * 0.10)
+
+        self.assertTrue((img[border, border:border + 8] == 254).all(),
+                        'Short burn did not mark the paper')
+        self.assertTrue((img[border, border + 8:-border] == 255).all(),
+                        'Unburned dots are not white')
+
+
+class TestPrintMechState(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.record = Path(self.tmpdir.name, 'record.csv')
+
+        # Generate a capture of a few dot lines, with some noise on DST.
+        rng = random.Random(0)
+        motor_sequence = [(0, 0), (1, 0), (1, 1), (0, 1)]
+        timestamp, clock, latch, dst, motor = 0.0, 0, 1, 0, 0
+        rows = []
+
+        def sample(duration: float, data: int = 0):
+            nonlocal timestamp
+            timestamp += duration
+            rows.append((timestamp, clock, data, latch, dst, *motor_sequence[motor % 4]))
+
+        sample(0.0)
+        for _ in range(12):
+            for _ in range(DOTS_PER_LINE + rng.randint(-8, 8)):
+                data = rng.randint(0, 1)
+                clock = 0
+                sample(4e-8, data)
+                clock = 1
+                sample(4e-8, data)
+                if rng.random() < 0.01:
+                    dst = 1 - dst
+                    sample(1e-7)
+            latch = 0
+            sample(1e-6)
+            latch = 1
+            sample(1e-6)
+            dst = 1
+            sample(rng.uniform(1e-4, 5e-4))
+            dst = 0
+            sample(1e-6)
+            for _ in range(rng.choice([1, 2, 2, 3])):
+                motor += 1
+                sample(rng.uniform(1e-5, 1e-4))
+
+        with open(self.record, 'w', encoding='utf-8') as file:
+            file.write('Time [s],Channel 0,Channel 1,Channel 2,Channel 3,Channel 4,Channel 5\n')
+            file.writelines(','.join(str(value) for value in row) + '\n' for row in rows)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_replay_matches_update(self):
+        with MechInputRecords(self.record) as records:
+            updated = PrintMechState(next(records))
+            for mech_input in records:
+                updated.update(mech_input)
+
+        with MechInputRecords(self.record) as records:
+            replayed = PrintMechState(next(records))
+            replayed.replay(records)
+
+        # Burn times are rounded differently, so ticks may be off by 1, but the same dots
+        # must be burned.
+        ticks_diff = replayed.paper.buffer.astype(int) - updated.paper.buffer.astype(int)
+        self.assertTrue((numpy.abs(ticks_diff) <= 1).all(),
+                        'Replayed paper does not match updated paper')
+        self.assertTrue(numpy.array_equal(replayed.paper.buffer > 0, updated.paper.buffer > 0),
+                        'Replayed paper burned different dots to updated paper')
+        self.assertEqual(replayed.motor_steps, updated.motor_steps,
+                         'Replayed motor steps do not match updated motor steps')
+        self.assertTrue(numpy.array_equal(replayed.latch_register, updated.latch_register),
+                        'Replayed latch register does not match updated latch register')
+        self.assertTrue(numpy.array_equal(replayed.get_printout().get_image() < WHITE_GS,
+                                          updated.get_printout().get_image() < WHITE_GS),
+                        'Replayed printout does not match updated printout')
@@ -0,0 +1,114 @@
+import unittest
+
+import numpy
+from numpy import uint8
+
+from printout import (Printout, SizeError, WHITE_GS, BLACK_GS, WHITE_BGR, BLACK_BGR, GREEN_BGR,
+                      RED_BGR)
+
+
+def blank_image(length: int, width: int) -> numpy.ndarray:
+    return numpy.full((length, width), WHITE_GS, dtype=uint8)
+
+
+class TestPrintoutLinesIter(unittest.TestCase):
+    def test_lines(self):
+        img = blank_image(10, 6)
+        img[2:4, 1] = BLACK_GS
+        img[6, 3] = 100
+
+        lines = list(Printout(img))
+
+        self.assertEqual(len(lines), 2, 'Incorrect number of lines')
+        self.assertTrue(numpy.array_equal(lines[0], img[2:4]), 'Incorrect first line')
+        self.assertTrue(numpy.array_equal(lines[1], img[6:7]), 'Incorrect second line')
+
+    def test_line_at_bottom_edge(self):
+        img = blank_image(6, 4)
+        img[0, 0] = BLACK_GS
+        img[4:, 2] = BLACK_GS
+
+        lines = list(Printout(img))
+
+        self.assertEqual(len(lines), 2, 'Incorrect number of lines')
+        self.assertTrue(numpy.array_equal(lines[0], img[0:1]), 'Incorrect top line')
+        self.assertTrue(numpy.array_equal(lines[1], img[4:6]), 'Bottom line dropped')
+
+    def test_blank(self):
+        self.assertEqual(list(Printout(blank_image(5, 4))), [], 'Blank printout has lines')
+
+    def test_lines_are_views(self):
+        img = blank_image(4, 4)
+        img[1:3, 1] = BLACK_GS
+
+        (line,) = Printout(img)
+
+        self.assertTrue(numpy.shares_memory(line, img), 'Line is a copy of the printout')
+
+
+class TestCreateDiff(unittest.TestCase):
+    def test_colours(self):
+        sample = blank_image(3, 3)
+        printout = blank_image(3, 3)
+
+        sample[0, 0] = BLACK_GS     # Removed.
+        printout[1, 1] = 100        # Added.
+        sample[2, 2] = BLACK_GS     # Both, in the last row and column.
+        printout[2, 2] = BLACK_GS
+
+        diff = Printout(sample).create_diff_with(Printout(printout))
+
+        self.assertEqual(diff.shape, (3, 3, 3), 'Incorrect diff size')
+        self.assertEqual(tuple(diff[0, 0]), RED_BGR, 'Removed pixel not red')
+        self.assertEqual(tuple(diff[1, 1]), GREEN_BGR, 'Added pixel not green')
+        self.assertEqual(tuple(diff[2, 2]), BLACK_BGR, 'Common pixel not black')
+        self.assertEqual(tuple(diff[0, 2]), WHITE_BGR, 'Blank pixel not white')
+        self.assertEqual(tuple(diff[2, 0]), WHITE_BGR, 'Blank pixel not white')
+
+
+class TestCompare(unittest.TestCase):
+    def test_partial_match(self):
+        sample = blank_image(6, 8)
+        sample[2, 1:5] = BLACK_GS
+        printout = sample.copy()
+        printout[2, 2] = WHITE_GS
+
+        # Only the printed area is compared, 1 of its 4 pixels differs.
+        self.assertEqual(Printout(sample).compare_with(Printout(printout)), 0.75,
+                         'Incorrect similarity')
+
+    def test_blank(self):
+        self.assertEqual(
+            Printout(blank_image(4, 4)).compare_with(Printout(blank_image(6, 5))), 1.0,
+            'Blank printouts do not match')
+
+    def test_size_mismatch(self):
+        sample = blank_image(6, 8)
+        sample[2, 1:5] = BLACK_GS
+        printout = blank_image(6, 8)
+        printout[2, 1:4] = BLACK_GS
+
+        with self.assertRaises(SizeError):
+            Printout(sample).compare_with(Printout(printout))
+
+
+class TestCaches(unittest.TestCase):
+    def test_extend_rebuilds_caches(self):
+        img = blank_image(2, 2)
+        img[:, :] = BLACK_GS
+        printout = Printout(img)
+        self.assertEqual(printout.ink_mask.shape, (2, 2), 'Incorrect ink mask size')
+        self.assertEqual(printout.rgb.shape, (2, 2, 3), 'Incorrect RGB size')
+
+        printout.extend_width_to(4)
+        printout.extend_length_to(3)
+
+        expected_mask = numpy.zeros((3, 4), dtype=uint8)
+        expected_mask[:2, 1:3] = WHITE_GS
+        self.assertTrue(numpy.array_equal(printout.ink_mask, expected_mask),
+                        'Ink mask not rebuilt after extending')
+
+        expected_rgb = numpy.full((3, 4, 3), WHITE_GS, dtype=uint8)
+        expected_rgb[:2, 1:3] = BLACK_GS
+        self.assertTrue(numpy.array_equal(printout.rgb, expected_rgb),
+                        'RGB not rebuilt after extending')